@@ -1,33 +1,59 @@
-from dash import Dash, dash_table, html
+from dash import Dash, Input, Output, dash_table, html
+import math
+import os
 import pandas as pd
 
-filename = "data/characters.csv"
+filename = "data/characters.parquet"
+page_size = 25  # rows sent to the browser at a time
 
-with open(filename) as f:
-    df = pd.read_csv(f)
+if os.path.exists(filename):
+    # already sorted and with the thumbnail column, see `MarvelExtractor.preprocess_characters`
+    df = pd.read_parquet(filename, dtype_backend="pyarrow")
+else:
+    # fall back to the csv when the data was not preprocessed into parquet yet
+    df = pd.read_csv("data/characters.csv", dtype_backend="pyarrow")
+    
+    # Thumbnail following markdown format: [![alt text](image link)](web link)
+    df["thumbnail"] = '[<img src="' + df["img"] + '" width="100" />](' + df["img"] + ')'
+    
+    # sort descending
+    df = df.sort_values("comics", ascending=False)
 
-# Thumbnail following markdown format: [![alt text](image link)](web link)
-df["thumbnail"] = df.apply( lambda x : '[<img src="' + x['img'] + '" width="100" />](' + x['img'] + ')', axis=1)
+columns = [
+    {"id": "id", "name": "ID"},
+    {"id": "name", "name": "Name"},
+    {"id": "thumbnail", "name": "Image", "presentation": "markdown"},
+    {"id": "comics", "name": "Comics"},
+]
+visible_columns = [c["id"] for c in columns]
 
-# sort descending
-df = df.sort_values("comics", ascending=False)
-
-app = Dash(__name__)
+app = Dash(__name__, compress=True)
 
 app.layout =  html.Div(
     [
         dash_table.DataTable(
-            data=df.to_dict('records'), 
-            columns=[
-                {"id": "id", "name": "ID"},
-                {"id": "name", "name": "Name"},
-                {"id": "thumbnail", "name": "Image", "presentation": "markdown"},
-                {"id": "comics", "name": "Comics"},
-            ],
-            markdown_options={"html": True},            
+            id="characters",
+            columns=columns,
+            markdown_options={"html": True},
+            # the table is paginated on the server, only the current page is sent to the browser
+            page_action="custom",
+            page_current=0,
+            page_size=page_size,
+            page_count=math.ceil(len(df) / page_size),
         )
     ]
 )
 
+@app.callback(
+    Output("characters", "data"),
+    Input("characters", "page_current"),
+    Input("characters", "page_size"),
+)
+def update_page(page_current, page_size):
+    """Get the records of the page being displayed."""
+    
+    page = df.iloc[page_current * page_size:(page_current + 1) * page_size]
+    return page[visible_columns].to_dict('records')
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
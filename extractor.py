@@ -1,32 +1,154 @@
 import os
 import requests 
+import requests_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+from urllib3.util.retry import Retry
 import time 
+import random
 import hashlib
-import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 import json
+import ijson
 import logging
+import threading
+from logging.handlers import RotatingFileHandler
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import orjson
+except ImportError:  # optional, the standard json module is used instead
+    orjson = None
+
+AUTH_MAX_AGE = 300  # seconds before the request timestamp and hash are regenerated
+MAX_RETRIES = 6     # retries of a throttled or failed page before giving up, so at most 7 requests per page
+RETRY_STATUSES = (429, 500, 502, 503, 504)  # http statuses worth retrying, any other error is raised right away
+BACKOFF_BASE = 0.2  # min seconds to wait before retrying a failed page
+BACKOFF_CAP = 30    # max seconds to wait before retrying a failed page
+
+# configure the logging once, unless the application already did it,
+# extractors only get a named logger
+if not logging.getLogger().handlers:
+    os.makedirs("logs", exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+        handlers=[
+            RotatingFileHandler("logs/debug.log", mode="a", maxBytes=10_000_000, backupCount=3),
+            logging.StreamHandler()
+        ]
+    )
+
+class RateLimitedAdapter(HTTPAdapter):
+    """HTTP adapter that limits the number of requests sent per second.
+    
+    A token bucket holding up to `requests_per_second` tokens is refilled continuously 
+    at that same rate. Each request takes a token, so requests are sent right away 
+    until the bucket is empty. The bucket is shared by all the threads using the adapter.
+    """
+    
+    def __init__(self, requests_per_second, **kwargs):
+        self._bucket_rate = requests_per_second
+        self._bucket_cap = requests_per_second
+        self._bucket_tokens = requests_per_second
+        self._bucket_ts = time.monotonic()
+        self._bucket_lock = threading.Lock()
+        super().__init__(**kwargs)
+        
+        
+    def send(self, request, **kwargs):
+        with self._bucket_lock:
+            now = time.monotonic()
+            self._bucket_tokens = min(self._bucket_cap, self._bucket_tokens + (now - self._bucket_ts) * self._bucket_rate)
+            self._bucket_ts = now
+            
+            if self._bucket_tokens < 1:
+                time.sleep((1 - self._bucket_tokens) / self._bucket_rate)
+                self._bucket_tokens = 1
+                self._bucket_ts = time.monotonic()
+                
+            self._bucket_tokens -= 1
+            
+        return super().send(request, **kwargs)
+    
 
 class MarvelExtractor:
     
-    def __init__(self, api_public_key, api_private_key):
+    def __init__(self, api_public_key, api_private_key, max_workers=5, cache_name="marvel_cache", cache_expire=86400, 
+                 requests_per_second=5):
         """Class constructor
 
         Attributes:
             api_public_key: A string with the public key 
             api_private_key: A string with the private key
+            max_workers: max number of pages requested concurrently. Defaults to 5.
+            cache_name: name of the sqlite file where API responses are cached. Set to None to disable the cache.
+            cache_expire: number of seconds a cached response is valid. Defaults to one day.
+            requests_per_second: sustained rate of requests allowed by the rate limiter. Defaults to 5.
         """
         
         self.api_public_key = api_public_key
         self.api_private_key = api_private_key
+        self.max_workers = max_workers
+        self.log = logging.getLogger('MarvelExtractor')
+        
+        # the parts of the parameters that never change for an extractor
+        self._params_template = {'apikey': api_public_key, 'limit': 100}
+        self._key_suffix = f'{api_private_key}{api_public_key}'.encode('utf-8')
+        self._auth = None   # cached (created, {ts, hash}) tuple, see `get_auth`
+        
+        # a single session keeps the connection to the API alive between pages
+        if cache_name is None:
+            self.session = requests.Session()
+        else:
+            # the auth parameters change on every run, so they are left out of the cache key
+            self.session = requests_cache.CachedSession(
+                cache_name, 
+                backend="sqlite", 
+                expire_after=cache_expire, 
+                cache_control=True,     # honor the Cache-Control/ETag headers sent by the API
+                allowable_methods=("GET",),
+                ignored_parameters=["ts", "hash", "apikey"]
+            )
+        # the json responses compress well, ask for every encoding urllib3 can decode 
+        # (brotli is only included when the Brotli package is installed)
+        self.session.headers.update({
+            "Accept": "application/json", 
+            "Accept-Encoding": make_headers(accept_encoding=True)["accept-encoding"], 
+            "Connection": "keep-alive"
+        })
+        # urllib3 only retries connection and read errors, 
+        # throttled or failed responses are retried with backoff by `get_page`
+        retries = Retry(total=5, backoff_factor=0.5, backoff_jitter=0.5, backoff_max=BACKOFF_CAP, 
+                        respect_retry_after_header=False, raise_on_status=False)
+        # keep at least one connection alive per worker, so concurrent pages never open new ones. 
+        # The rate limit lives in the adapter, so responses served from the cache never wait for it
+        adapter = RateLimitedAdapter(requests_per_second, pool_connections=4, pool_maxsize=max(16, max_workers), 
+                                     max_retries=retries)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        
+    def get_auth(self):
+        """Get the timestamp and hash used to authenticate the requests.
+        
+        The pair is cached and only regenerated once it is older than `AUTH_MAX_AGE` seconds, 
+        so long extractions keep sending a recent timestamp without hashing on every request.
         
-        logging.basicConfig(
-            level=logging.INFO,
-            format="%(asctime)s [%(levelname)s] %(message)s",
-            handlers=[
-                logging.FileHandler("logs/debug.log", mode="w"),
-                logging.StreamHandler()
-            ]
-        )
+        Returns:
+            dict: ts (current timestamp) and hash (a md5 digest made of ts+private_key+public_key)
+        """
+        
+        now = time.time()
+        if self._auth is None or now - self._auth[0] > AUTH_MAX_AGE:
+            ts = str(now)
+            hashed_params = hashlib.md5(ts.encode('utf-8') + self._key_suffix, usedforsecurity=False).hexdigest()
+            self._auth = (now, {'ts': ts, 'hash': hashed_params})
+            
+        return self._auth[1]
         
         
     def get_params(self):
@@ -35,24 +157,19 @@ class MarvelExtractor:
         The dictionary includes:
             ts: current timestamp
             apikey: public api key
-            hash: a md5 digest made of ts+public_key+private_key
+            hash: a md5 digest made of ts+private_key+public_key
             limit: max number of records to retrieve
             offset: the initial offset is set to 0
         """
     
-        ts = time.time()
-        hash_md5 = hashlib.md5()
-        hash_md5.update(f'{ts}{ self.api_private_key }{ self.api_public_key }'.encode('utf-8'))
-        hashed_params = hash_md5.hexdigest()
-
-        params = {
-            'ts': ts,
-            'apikey': self.api_public_key,
-            'hash': hashed_params,
-            'limit': 100,
-            'offset': 0
-        }
+        params = {**self._params_template, **self.get_auth(), 'offset': 0}
         return params 
+    
+    
+    def close(self):
+        """Close the underlying HTTP session and release its pooled connections."""
+        
+        self.session.close()
             
             
     def save_to_file(self, data, filename):
@@ -64,70 +181,229 @@ class MarvelExtractor:
             filename: the filepath where the data is saved.
         """
         
-        logging.info('Saving data to file...')
+        self.log.info('Saving data to file...')
         
-        with open(filename, 'w') as f: 
-            json.dump(data, f)
+        if orjson is None:
+            with open(filename, 'w') as f: 
+                json.dump(data, f)
+        else:
+            with open(filename, 'wb') as f: 
+                f.write(orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE))
             
-        logging.info('Done.')
+        self.log.info('Done.')
             
     
-    def get_records(self, api_url, limit=0):
-        """A generic method to retrieve records from the api
+    def _request(self, api_url, params):
+        """Send a GET request to the api.
+        
+        The rate limit is applied by the `RateLimitedAdapter` mounted on the session, 
+        so only the requests that actually reach the network wait for it.
 
         Args:
-            api_url (str): _description_
-            limit (int, optional): total number of records to retrieve. Defaults to 0 (all available records are extracted).
+            api_url (str): the endpoint to query
+            params (dict): the query parameters
+
+        Returns:
+            requests.Response: the response of the api
         """
-        params = self.get_params()
-            
-        final = []      # the final list to return
-        nrecords = 0    # record count
-        offset = 100    # max offset allowed by the API
+        return self.session.get(api_url, params=params, timeout=(5, 30))
+    
+    
+    def get_page(self, api_url, params):
+        """Request a single page of records, retrying throttled or failed requests with exponential backoff.
+
+        Args:
+            api_url (str): the endpoint to query
+            params (dict): the query parameters, including the `offset` of the page
+
+        Returns:
+            dict: the `data` container of the response, holding `total` and `results`
             
-        while True: 
-            time.sleep(2) # wait before each request
-            logging.info(f"Collecting records {nrecords}-{nrecords+offset}...")
-            response = requests.get(api_url, params=params) 
+        Raises:
+            requests.HTTPError: if the api answers with an error that is not worth retrying 
+                (see `RETRY_STATUSES`), or still fails after `MAX_RETRIES` retries
+        """
+        delay = BACKOFF_BASE
+        
+        for attempt in range(MAX_RETRIES + 1): 
+            params = {**params, **self.get_auth()}  # refresh the timestamp on long extractions
+            self.log.info(f"Collecting records {params['offset']}-{params['offset']+params['limit']}...")
+            response = self._request(api_url, params) 
                     
             if response.status_code == 200: 
-                data = response.json() 
+                data = response.json() if orjson is None else orjson.loads(response.content)
                 
                 if data["code"] == 200: # correct response
+                    return data["data"]
+                
+                error = f"API Error: {data['code']}"
+                self.log.error(error)
+                raise requests.HTTPError(error, response=response)
+            
+            error = f"Error during request: {response.status_code}, {response.text}"
+            self.log.error(error)
+            if response.status_code not in RETRY_STATUSES:
+                raise requests.HTTPError(error, response=response)
+            if attempt == MAX_RETRIES:
+                break
+            
+            # exponential backoff with decorrelated jitter, so concurrent retries spread out,
+            # waiting at least as long as the server asks for
+            delay = random.uniform(BACKOFF_BASE, min(BACKOFF_CAP, delay * 3))
+            retry_after = response.headers.get("Retry-After", "")
+            time.sleep(max(delay, int(retry_after)) if retry_after.isdigit() else delay)
+            
+        raise requests.HTTPError(f"Giving up after {MAX_RETRIES} retries. {error}", response=response)
+            
+    
+    def iter_records(self, api_url, limit=0):
+        """Retrieve records from the api, yielding each page as soon as it is downloaded.
+        
+        The first page is requested alone to learn the total number of records. 
+        The remaining pages are then requested concurrently over the shared session, 
+        so they are yielded in the order they arrive, which may differ from their offset. 
+        The records of a page can be processed while the next pages are downloaded.
+
+        Args:
+            api_url (str): the endpoint to query
+            limit (int, optional): total number of records to retrieve. Defaults to 0 (all available records are extracted).
+            
+        Yields:
+            tuple: the offset of the page, its records and the number of records expected from the whole extraction
+        """
+        params = self.get_params()
+        page_size = params['limit']    # max number of records per page allowed by the API
+        
+        header = self.get_page(api_url, params)
+        total = header["total"]
+        self.log.info(f"Total available records: {total} ")
+        
+        limit = total if limit == 0 else min(limit, total)
+        
+        if len(header['results']) < page_size:   # a short page is the last one
+            limit = min(limit, len(header['results']))
+        
+        batch = header['results'][:limit]
+        nrecords = len(batch)    # record count
+        self.log.info(f"... sucessfully collected {nrecords} out of {total} records.")
+        yield 0, batch, limit
+        
+        # the remaining offsets are known at this point, so the pages are independent
+        offsets = range(page_size, limit, page_size)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.get_page, api_url, {**params, 'offset': offset}): offset for offset in offsets}
+            
+            try:
+                for future in as_completed(futures):
+                    if future.cancelled():
+                        continue
                     
-                    header = data["data"]
-                    total = header["total"]
-                    
-                    limit = total if limit == 0 else limit
-                    
-                    if nrecords == 0: # first iteration
-                        logging.info(f"Total available records: {total} ")            
-                    
-                    final.extend(header['results'])  # 'data' contains the batch of results 
+                    offset = futures[future]
+                    batch = future.result()['results'][:limit - offset]
+                    nrecords += len(batch)
+                    self.log.info(f"... sucessfully collected {nrecords} out of {total} records.")
+                    yield offset, batch, limit
                     
-                    nrecords += offset
+                    # a short page is the last one, the pages after it would come back empty
+                    if len(batch) < min(page_size, limit - offset):
+                        for pending, pending_offset in futures.items():
+                            if pending_offset > offset:
+                                pending.cancel()
+            finally:
+                # do not wait for pages nobody will consume if the caller stops early
+                for pending in futures:
+                    pending.cancel()
+            
+    
+    def get_records(self, api_url, limit=0):
+        """A generic method to retrieve records from the api.
+        
+        The pages are downloaded with `iter_records` and stored at their offset as they arrive.
+
+        Args:
+            api_url (str): the endpoint to query
+            limit (int, optional): total number of records to retrieve. Defaults to 0 (all available records are extracted).
+        """
+        final = []      # the final list to return
+        nrecords = 0    # record count
+        
+        for offset, batch, expected in self.iter_records(api_url, limit):
+            if offset == 0:
+                final = [None] * expected   # each page is stored at its offset
+            final[offset:offset + len(batch)] = batch
+            nrecords += len(batch)
+        
+        if nrecords < len(final):    # records were removed from the catalog during the extraction
+            final = [record for record in final if record is not None]
+            
+        return final
+            
+
+    def get_records_keyset(self, api_url, limit=0, modified_since=None, tiebreaker=None):
+        """Retrieve records from the api walking through them by modification date.
+        
+        Records are requested ordered by `modified`. Instead of moving the offset deeper, 
+        each page asks for the records modified since the last date seen, so the server 
+        does not have to skip the rows already returned. The offset is only used to step 
+        over the records that share that date, so those records must come back in the same 
+        order on every request: `tiebreaker` adds the fields that sort them to `orderBy`. 
+        Endpoints whose records have no `modified` attribute are paginated by offset.
+
+        Args:
+            api_url (str): the endpoint to query
+            limit (int, optional): total number of records to retrieve. Defaults to 0 (all available records are extracted).
+            modified_since (str, optional): only retrieve the records modified since this date. Defaults to None (all records).
+            tiebreaker (str, optional): comma separated fields ordering the records that share a date, e.g. "name".
+        """
+        order_by = 'modified' if tiebreaker is None else f'modified,{tiebreaker}'
+        params = {**self.get_params(), 'orderBy': order_by}
+        if modified_since is not None:
+            params['modifiedSince'] = modified_since
+        page_size = params['limit']
+        
+        header = self.get_page(api_url, params)
+        total = header["total"]
+        self.log.info(f"Total available records: {total} ")
+        
+        limit = total if limit == 0 else min(limit, total)
+        keyset = all("modified" in r for r in header['results'])
+        
+        final = [None] * limit  # the final list to return, filled in order
+        nrecords = 0            # record count
+        seen_ids = set()        # records at a page boundary may be returned twice
+        
+        while True:
+            results = header['results']
+            for record in results:
+                if nrecords < limit and record['id'] not in seen_ids:
+                    seen_ids.add(record['id'])
+                    final[nrecords] = record
+                    nrecords += 1
                     
-                    logging.info(f"... sucessfully collected {nrecords} out of {total} records.")
+            self.log.info(f"... sucessfully collected {nrecords} out of {limit} records.")
+            
+            if len(results) < page_size or nrecords >= limit:
+                break
+            
+            if not keyset or params.get('modifiedSince') == results[-1]['modified']:
+                # move past the records received, for keyset pages this steps through 
+                # a block of records that all share the same date
+                params['offset'] += len(results)
+            else:
+                params['modifiedSince'] = results[-1]['modified']
+                params['offset'] = sum(1 for r in results if r['modified'] == params['modifiedSince'])
                 
-                    # Check if there are more results to fetch
-                    if nrecords >= limit:
-                        break
-                    else: # nrecords < total: 
-                        params['offset'] = nrecords  # Update the offset parameter 
-                                
-                else:
-                    logging.error(f"API Error: {data.code}") 
-                    time.sleep(2)   # Simple backoff on error 
-                    continue        # Retry the same request 
-            else: 
-                logging.error(f"Error during request: {response.status_code}, {response.text}") 
-                time.sleep(2)  # Simple backoff on error 
-                continue       # Retry the same request
+            header = self.get_page(api_url, params)
+            
+        if nrecords < limit:
+            # records were removed from the catalog, or records sharing a date were skipped
+            self.log.warning(f"Only {nrecords} out of {limit} records were collected.")
+            del final[nrecords:]
             
         return final
             
 
-    def get_characters(self, limit=0): 
+    def get_characters(self, limit=0, keyset=False): 
         """Get a list of all the Marvel characters. The list contains dictionaries with characters' attributes. 
         See https://developer.marvel.com/docs#!/public/getCreatorCollection_get_0 
         
@@ -135,64 +411,210 @@ class MarvelExtractor:
         
         Attributes:
             limit: max number of records to retrieve. All the records are retrieved by default.
+            keyset: paginate by modification date with `get_records_keyset` instead of by offset.
         """
         
-        api_url = "http://gateway.marvel.com/v1/public/characters" 
-        final = self.get_records(api_url, limit)
+        api_url = "https://gateway.marvel.com/v1/public/characters" 
+        final = self.get_records_keyset(api_url, limit, tiebreaker="name") if keyset else self.get_records(api_url, limit)
         return final 
     
     
+    def iter_characters(self, limit=0):
+        """Get the Marvel characters page by page, as soon as each page is downloaded. See `iter_records`.
+        
+        Attributes:
+            limit: max number of records to retrieve. All the records are retrieved by default.
+            
+        Yields:
+            tuple: the offset of the page and the list of characters in it
+        """
+        
+        api_url = "https://gateway.marvel.com/v1/public/characters" 
+        for offset, batch, _ in self.iter_records(api_url, limit):
+            yield offset, batch
+    
+    
+    def update_characters(self, filename):
+        """Update a json file of characters, downloading only the characters modified since the last update.
+        
+        The date of the most recently modified character is kept in a file next to `filename` 
+        (same name, `.modified` extension). When both files exist, only the characters modified 
+        since that date are requested and merged by id into the saved ones, and the files are 
+        only rewritten if something changed. Otherwise all the characters are downloaded with 
+        `get_records`. Characters removed from the API are not removed from the file.
+        
+        The `modified` date of a character does not change when it appears in new comics, 
+        so the comic counts of the saved characters are not refreshed. Use `get_characters` 
+        to download up to date counts.
+        
+        Attributes:
+            filename: the json file with the characters, as written by `save_to_file`
+            
+        Returns:
+            list: the updated list of characters
+        """
+        
+        state_filename = os.path.splitext(filename)[0] + ".modified"
+        api_url = "https://gateway.marvel.com/v1/public/characters" 
+        
+        characters = []
+        modified_since = None
+        if os.path.exists(filename) and os.path.exists(state_filename):
+            with open(filename, "rb") as f:
+                characters = json.load(f) if orjson is None else orjson.loads(f.read())
+            with open(state_filename) as f:
+                modified_since = f.read().strip()
+            self.log.info(f"Updating characters modified since {modified_since}...")
+        
+        if modified_since is None:
+            # nothing saved yet, the whole catalog is downloaded concurrently
+            changed = self.get_records(api_url)
+            latest = max((c["modified"] for c in changed), default=None)
+        else:
+            # `modifiedSince` is inclusive, so the saved characters of that date come back again
+            saved_ids = {c["id"] for c in characters}
+            changed = [c for c in self.get_records_keyset(api_url, modified_since=modified_since, tiebreaker="name") 
+                       if not (c["modified"] == modified_since and c["id"] in saved_ids)]
+            # records come ordered by `modified`, so the last one is the most recent
+            latest = changed[-1]["modified"] if changed else modified_since
+        
+        if changed:
+            merged = {c["id"]: c for c in characters}
+            merged.update((c["id"], c) for c in changed)
+            characters = list(merged.values())
+            
+            self.save_to_file(characters, filename)
+            with open(state_filename, "w") as f:
+                f.write(latest)
+                
+        self.log.info(f"{len(changed)} characters added or updated.")
+        return characters
+    
+    
+    def characters_to_table(self, characters):
+        """Build an arrow table with the attributes of the characters used by the dashboard.
+        
+        Only the required attributes are extracted, straight into typed columns, 
+        so no DataFrame of the nested records is built.
+
+        Args:
+            characters (iterable): dictionaries containing characters data, as returned by `get_characters`
+
+        Returns:
+            pa.Table: a table with the columns id, name, img and comics
+        """
+        ids, names, imgs, comics = [], [], [], []
+        for c in characters:
+            ids.append(c["id"])
+            names.append(c["name"])
+            imgs.append(c["thumbnail"]["path"] + "." + c["thumbnail"]["extension"])
+            comics.append(c["comics"]["available"])
+            
+        return pa.table({
+            "id": pa.array(ids, pa.int32()), 
+            "name": pa.array(names, pa.string()), 
+            "img": pa.array(imgs, pa.string()), 
+            "comics": pa.array(comics, pa.int32())
+        })
+    
+    
     def preprocess_characters(self, output_filename, data_input=None, file_input=None):
         """Preprocess a list of Marvel characters. 
-        As a result, a csv file is created with the following attributes:
+        As a result, a csv file and a parquet file with the same name are created with the following attributes:
         * id: unique id of the character
         * name: name of the character
         * img: url pointing to the thumbnail of the character
         * comics: number of comics the character appears in
         
+        The parquet file is meant for the dashboard: it is sorted by comics in descending order 
+        and also includes a `thumbnail` column with the image in markdown format.
+        
         Attributes:
             output_filename: filename where the output will be saved
             data_input: an in-memory list of dictionaries containing characters data downloaded with `get_characters`
             file_input: a json file containing characters data
         """        
-        logging.info('Loading data...')
+        self.log.info('Loading data...')
         
-        df = pd.DataFrame()
         if (file_input is None) and (data_input is None):
-            logging.error('You must provide data either in file format or dictorionary.')
+            self.log.error('You must provide data either in file format or dictorionary.')
             return 
-        elif data_input:
-            df = pd.DataFrame(data=data_input)
+        
+        self.log.info('Preprocessing...')
+        
+        if data_input is not None:
+            table = self.characters_to_table(data_input)
         else:
-            df = pd.read_json("data/characters.json")
+            # stream the records from the file instead of loading the whole json in memory,
+            # reading it in large blocks to keep the number of system calls low
+            with open(file_input, "rb", buffering=1 << 20) as f:
+                table = self.characters_to_table(ijson.items(f, "item"))
         
-        logging.info('Preprocessing...')
+        self.write_characters(table, output_filename)
         
-        df["img"] = df.apply(lambda x : x['thumbnail']["path"] + "." + x['thumbnail']["extension"], axis=1)
+        self.log.info('Done.')
         
-        df["comics"] = df.apply(lambda x : x['comics']["available"], axis=1) 
         
-        logging.info('Saving preprocessed data to csv...')
+    def extract_characters(self, output_filename, limit=0):
+        """Download and preprocess the Marvel characters in a single pass.
         
-        df[["id", "name", "img", "comics"]].to_csv(output_filename, index=False)
+        Each page is converted with `characters_to_table` as soon as it is downloaded, 
+        while the next pages are still being requested, so preprocessing overlaps with 
+        the network waits. The output is the same as `preprocess_characters`, 
+        but the raw records are not kept.
         
-        logging.info('Done.')
+        Attributes:
+            output_filename: filename where the output will be saved
+            limit: max number of records to retrieve. All the records are retrieved by default.
+        """
+        
+        tables = {offset: self.characters_to_table(batch) for offset, batch in self.iter_characters(limit)}
+        
+        # restore the order of the api, the pages arrive in any order
+        table = pa.concat_tables([tables[offset] for offset in sorted(tables)])
+        self.write_characters(table, output_filename)
         
+        self.log.info('Done.')
         
-    def get_character_comics(self, character_id, limit=0):
+        
+    def write_characters(self, table, output_filename):
+        """Save preprocessed characters as a csv file and as a parquet file with the same name.
+        
+        See `preprocess_characters` for the content of each file.
+        
+        Attributes:
+            table: an arrow table built with `characters_to_table`
+            output_filename: filename of the csv file
+        """
+        
+        self.log.info('Saving preprocessed data to csv...')
+        
+        pa_csv.write_csv(table, output_filename)
+        
+        self.log.info('Saving preprocessed data to parquet...')
+        
+        # the dashboard loads this copy as is, so the table column and the order are computed here
+        # Thumbnail following markdown format: [![alt text](image link)](web link)
+        thumbnail = pc.binary_join_element_wise('[<img src="', table["img"], '" width="100" />](', table["img"], ')', "")
+        table = table.append_column("thumbnail", thumbnail).sort_by([("comics", "descending")])
+        pq.write_table(table, os.path.splitext(output_filename)[0] + ".parquet")
+        
+        
+    def get_character_comics(self, character_id, limit=0, keyset=False):
         """Gets all the comics in which a given character appears in
 
         Args:
             character_id (int): the id of the character
             limit (int, optional): total number of records to retrieve. Defaults to 0 (all available records are extracted).
+            keyset (bool, optional): paginate by modification date with `get_records_keyset` instead of by offset.
         """
         
-        api_url = f"http://gateway.marvel.com/v1/public/characters/{character_id}/comics" 
-        final = self.get_records(api_url, limit)
+        api_url = f"https://gateway.marvel.com/v1/public/characters/{character_id}/comics" 
+        final = self.get_records_keyset(api_url, limit, tiebreaker="title,issueNumber") if keyset else self.get_records(api_url, limit)
         return final
 
         
-    def get_comics(self, limit=0):
+    def get_comics(self, limit=0, keyset=False):
         """Gets a list of all the available Marvel comics. The result is a list of dictionaries with comic's attributes. 
         More details https://developer.marvel.com/docs#!/public/getCreatorCollection_get_0 
         
@@ -200,11 +622,12 @@ class MarvelExtractor:
         
         Attributes:
             limit: total number of records to retrieve. All the records are retrieved by default.
+            keyset: paginate by modification date with `get_records_keyset` instead of by offset.
         
         """
         
-        api_url = "http://gateway.marvel.com/v1/public/comics"
-        final = self.get_records(api_url, limit)
+        api_url = "https://gateway.marvel.com/v1/public/comics"
+        final = self.get_records_keyset(api_url, limit, tiebreaker="title,issueNumber") if keyset else self.get_records(api_url, limit)
         return final
         
 
@@ -223,6 +646,8 @@ if __name__ == '__main__':
     mv.save_to_file(data, "data/characters.json")
     mv.preprocess_characters(data_input=data, output_filename="data/characters.csv")
     
+    mv.close()
+    
 
     
     
@@ -1,6 +1,14 @@
 import unittest
 import os
-from extractor import MarvelExtractor
+import json
+import time
+import random
+import io
+import tempfile
+from unittest import mock
+import requests
+from urllib3 import HTTPResponse
+from extractor import MarvelExtractor, RateLimitedAdapter
 import pandas as pd
 
 class TestMv(unittest.TestCase):
@@ -12,6 +20,9 @@ class TestMv(unittest.TestCase):
         # init the extractor
         self.mv = MarvelExtractor(public_key, private_key)
         
+    def tearDown(self):
+        self.mv.close()
+        
     def test_ncharacters(self):
         
         limit = 300
@@ -42,6 +53,16 @@ class TestMv(unittest.TestCase):
         df2 = pd.read_csv('data/test.csv')
         
         self.assertEqual(df2["id"].nunique(), limit)
+        
+        
+    def test_transform_file(self):
+        
+        self.mv.preprocess_characters(output_filename='data/test.csv', file_input='data/characters.json')
+        
+        df = pd.read_csv('data/test.csv')
+        expected = pd.read_csv('data/characters.csv')
+        
+        pd.testing.assert_frame_equal(df, expected)
          
         
     def test_num_comics(self):
@@ -72,6 +93,261 @@ class TestMv(unittest.TestCase):
         df = pd.read_json('data/characters.json')
         for t in test_data:
             self.assertTrue( df.loc[ df["id"] == t["id"], "comics" ].values[0], t["count"] )
+
+
+class FakeApi:
+    """Serve pages of the given records, replacing `MarvelExtractor._request`.
+    
+    Supports `limit`, `offset`, `orderBy` and an inclusive `modifiedSince`, 
+    like the Marvel API does.
+    """
+    
+    def __init__(self, records, total=None, overlap=0, empty_delay=0, unstable=False):
+        self.records = records
+        self.total = total          # reported total, defaults to the number of records
+        self.overlap = overlap      # records of the previous page repeated at the start of each page
+        self.empty_delay = empty_delay
+        self.unstable = unstable    # records that tie on `orderBy` come back in a random order
+        self.statuses = []          # http statuses returned by the next requests, before any page
+        self.calls = 0
+        
+    def __call__(self, api_url, params):
+        self.calls += 1
+        if self.statuses:
+            response = requests.Response()
+            response.status_code = self.statuses.pop(0)
+            response._content = b''
+            return response
+        
+        records = self.records
+        if 'orderBy' in params:
+            if self.unstable:
+                records = random.sample(records, len(records))
+            fields = params['orderBy'].split(',')
+            records = sorted(records, key=lambda r: [r[field] for field in fields])
+        if 'modifiedSince' in params:
+            records = [r for r in records if r['modified'] >= params['modifiedSince']]
+            
+        start = max(0, params['offset'] - self.overlap) if params['offset'] else 0
+        results = records[start:start + params['limit']]
+        if not results:
+            time.sleep(self.empty_delay)
+        
+        body = {'code': 200, 'data': {'total': self.total or len(records), 'results': results}}
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps(body).encode('utf-8')
+        return response
+    
+
+class TestMvOffline(unittest.TestCase):
+    
+    def setUp(self):
+        with open('data/characters.json') as f:
+            self.characters = json.load(f)
+            
+        self.api = FakeApi(self.characters)
+        self.mv = MarvelExtractor('public', 'private', cache_name=None)
+        patcher = mock.patch.object(self.mv, '_request', self.api)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+    def tearDown(self):
+        self.mv.close()
+        
+    def test_offset_pages(self):
+        
+        data = self.mv.get_characters()
+        self.assertEqual(data, self.characters)
+        
+        data = self.mv.get_characters(limit=250)
+        self.assertEqual(data, self.characters[:250])
+        
+    def test_keyset_pages(self):
+        
+        data = self.mv.get_characters(keyset=True)
+        ids = [c['id'] for c in data]
+        dates = [c['modified'] for c in data]
+        
+        self.assertEqual(len(ids), len(self.characters))
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(dates, sorted(dates))
+        # most of the characters share a single date, the pages step through it by offset
+        self.assertGreater(max(dates.count(d) for d in set(dates)), self.mv.get_params()['limit'])
+        
+    def test_keyset_dedupe(self):
+        
+        self.api.overlap = 3
+        data = self.mv.get_characters(keyset=True)
+        ids = [c['id'] for c in data]
+        
+        self.assertEqual(len(ids), len(self.characters))
+        self.assertEqual(len(set(ids)), len(ids))
+        
+    def test_keyset_unstable_ties(self):
+        
+        # without a tiebreaker the records sharing a date would be skipped or repeated
+        random.seed(0)
+        self.api.unstable = True
+        data = self.mv.get_characters(keyset=True)
+        ids = [c['id'] for c in data]
+        
+        self.assertEqual(len(ids), len(self.characters))
+        self.assertEqual(len(set(ids)), len(ids))
+        
+        with self.assertLogs('MarvelExtractor', level='WARNING'):
+            data = self.mv.get_records_keyset("https://gateway.marvel.com/v1/public/characters")
+        self.assertLess(len(data), len(self.characters))
+        
+    def test_retry_throttled(self):
+        
+        self.api.statuses = [429]
+        with mock.patch('extractor.time.sleep') as sleep:
+            data = self.mv.get_page("https://gateway.marvel.com/v1/public/characters", self.mv.get_params())
+            
+        self.assertEqual(data['results'], self.characters[:100])
+        self.assertEqual(self.api.calls, 2)
+        sleep.assert_called_once()
+        
+    def test_no_retry_client_error(self):
+        
+        self.api.statuses = [401]
+        with mock.patch('extractor.time.sleep') as sleep:
+            with self.assertRaises(requests.HTTPError):
+                self.mv.get_page("https://gateway.marvel.com/v1/public/characters", self.mv.get_params())
+                
+        self.assertEqual(self.api.calls, 1)
+        sleep.assert_not_called()
+        
+    def test_retry_gives_up(self):
+        
+        self.api.statuses = [503] * 10
+        with mock.patch('extractor.time.sleep'):
+            with self.assertRaises(requests.HTTPError):
+                self.mv.get_page("https://gateway.marvel.com/v1/public/characters", self.mv.get_params())
+                
+        self.assertEqual(self.api.calls, 7)
+        
+    def test_short_page_cancels(self):
+        
+        # the reported total is larger than the catalog, the pages after the short one are empty
+        self.api.total = 5000
+        self.api.empty_delay = 0.2
+        self.mv.max_workers = 1
+        
+        data = self.mv.get_characters()
+        
+        self.assertEqual(data, self.characters)
+        self.assertLessEqual(self.api.calls, 17)
+        
+    def test_update(self):
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'characters.json')
+            
+            data = self.mv.update_characters(filename)
+            self.assertEqual(data, self.characters)
+            with open(os.path.join(tmp, 'characters.modified')) as f:
+                self.assertEqual(f.read(), max(c['modified'] for c in self.characters))
+            
+            # nothing changed, the file is not written again
+            with mock.patch.object(self.mv, 'save_to_file') as save:
+                data = self.mv.update_characters(filename)
+                save.assert_not_called()
+            self.assertEqual(data, self.characters)
+            
+            changed = {**self.characters[5], 'name': 'Changed', 'modified': '2099-01-01T00:00:00-0400'}
+            self.api.records = self.characters[:5] + [changed] + self.characters[6:]
+            
+            data = self.mv.update_characters(filename)
+            self.assertEqual(len(data), len(self.characters))
+            self.assertEqual(data[5]['name'], 'Changed')
+            with open(filename) as f:
+                self.assertEqual(json.load(f), data)
+            with open(os.path.join(tmp, 'characters.modified')) as f:
+                self.assertEqual(f.read(), changed['modified'])
+        
+    def test_extract(self):
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'characters.csv')
+            self.mv.extract_characters(output_filename=filename)
+            
+            df = pd.read_csv(filename)
+            expected = pd.read_csv('data/characters.csv')
+            
+            pd.testing.assert_frame_equal(df, expected)
+            
+    def test_write_parquet(self):
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            self.mv.preprocess_characters(output_filename=os.path.join(tmp, 'characters.csv'), 
+                                          file_input='data/characters.json')
+            df = pd.read_parquet(os.path.join(tmp, 'characters.parquet'))
+            
+        # the dashboard shows this file as is: sorted by comics and with the markdown thumbnail
+        expected = pd.read_csv('data/characters.csv')
+        self.assertEqual(list(df.columns), ['id', 'name', 'img', 'comics', 'thumbnail'])
+        self.assertEqual(len(df), len(expected))
+        self.assertTrue(df['comics'].is_monotonic_decreasing)
+        self.assertEqual(df['comics'].iloc[0], expected['comics'].max())
+        
+        thumbnails = '[<img src="' + df['img'] + '" width="100" />](' + df['img'] + ')'
+        self.assertTrue((df['thumbnail'] == thumbnails).all())
+            
+
+def fake_send(adapter, request, **kwargs):
+    """Answer every request with an empty page, replacing `HTTPAdapter.send`."""
+    
+    body = b'{"code": 200, "data": {"total": 0, "results": []}}'
+    raw = HTTPResponse(body=io.BytesIO(body), status=200, headers={'Content-Type': 'application/json'}, 
+                       preload_content=False, request_url=request.url)
+    return adapter.build_response(request, raw)
+
+
+class TestRateLimitedAdapter(unittest.TestCase):
+    
+    def setUp(self):
+        # a fake clock, advanced only by sleeping
+        self.now = 100.0
+        self.sleeps = []
+        
+        def sleep(seconds):
+            self.sleeps.append(seconds)
+            self.now += seconds
+            
+        for patcher in (mock.patch('extractor.time.monotonic', lambda: self.now), 
+                        mock.patch('extractor.time.sleep', sleep),
+                        mock.patch('extractor.HTTPAdapter.send', autospec=True, side_effect=fake_send)):
+            self.send = patcher.start()
+            self.addCleanup(patcher.stop)
+            
+    def test_burst_then_wait(self):
+        
+        rate = 5
+        session = requests.Session()
+        session.mount('https://', RateLimitedAdapter(rate))
+        
+        for _ in range(rate):
+            session.get('https://gateway.marvel.com/v1/public/characters')
+        self.assertEqual(self.sleeps, [])
+        
+        session.get('https://gateway.marvel.com/v1/public/characters')
+        self.assertEqual(len(self.sleeps), 1)
+        self.assertAlmostEqual(self.sleeps[0], 1 / rate)
+        self.assertEqual(self.send.call_count, rate + 1)
+        
+    def test_cached_responses_skip_limit(self):
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            mv = MarvelExtractor('public', 'private', cache_name=os.path.join(tmp, 'cache'), requests_per_second=1)
+            for _ in range(5):
+                mv.get_page('https://gateway.marvel.com/v1/public/characters', mv.get_params())
+            mv.close()
+            
+        # the first request takes the only token, the others are served from the cache
+        self.assertEqual(self.send.call_count, 1)
+        self.assertEqual(self.sleeps, [])
             
 
 if __name__ == '__main__':